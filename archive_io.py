@@ -0,0 +1,188 @@
+"""
+直接从 zip / tar 归档中读取课表页面，并将生成的 ICS 写回输出归档，无需解压到磁盘
+
+- 未压缩的 .tar 与 zip 中以 STORED 方式存放的成员通过 mmap 切片读取，不复制数据
+- .tar.gz / .tgz / .tar.bz2 / .tar.xz 以流式方式顺序读取
+- zip 中压缩过的成员逐个解压到内存
+
+用法示例：
+    python archive_io.py pages.zip calendars.zip --semester-start 20250224 --rest-weeks 3,1
+"""
+import argparse
+import io
+import mmap
+import os
+import struct
+import tarfile
+import time
+import zipfile
+from datetime import datetime
+
+from parser import Parser
+from ics_writer import Writer
+from batch_job import HTML_SUFFIXES
+from semester_fetcher import fetch_semester_info, parse_rest_weeks
+from event_template import load_templates
+
+# 流式读取的压缩 tar 扩展名
+COMPRESSED_TAR_SUFFIXES = (".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+# zip 本地文件头：固定 30 字节，文件名长度与扩展字段长度位于偏移 26 处
+ZIP_LOCAL_HEADER_SIZE = 30
+ZIP_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+
+def iter_archive_pages(archive_path):
+    """
+    依次产出归档中的课表页面 (成员名, 内容)
+    内容为 bytes 或 memoryview，只在迭代到下一个成员之前有效
+    """
+    lower = archive_path.lower()
+    if lower.endswith(".zip"):
+        yield from _iter_zip(archive_path)
+    elif lower.endswith(".tar"):
+        yield from _iter_tar_mmap(archive_path)
+    elif lower.endswith(COMPRESSED_TAR_SUFFIXES):
+        yield from _iter_tar_stream(archive_path)
+    else:
+        raise ValueError(f"不支持的归档格式: {archive_path}")
+
+def _is_page(name):
+    return name.lower().endswith(HTML_SUFFIXES)
+
+def _iter_zip(archive_path):
+    with open(archive_path, "rb") as f, zipfile.ZipFile(f) as zf:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(archive_path) else None
+        try:
+            for info in zf.infolist():
+                if info.is_dir() or not _is_page(info.filename):
+                    continue
+                if mm is not None and info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & 0x1:
+                    # 未压缩且未加密：跳过本地文件头后直接切片
+                    offset = info.header_offset
+                    header = mm[offset:offset + ZIP_LOCAL_HEADER_SIZE]
+                    if header[:4] != ZIP_LOCAL_HEADER_SIGNATURE:
+                        raise zipfile.BadZipFile(f"本地文件头损坏: {info.filename}")
+                    name_len, extra_len = struct.unpack("<HH", header[26:30])
+                    start = offset + ZIP_LOCAL_HEADER_SIZE + name_len + extra_len
+                    view = memoryview(mm)[start:start + info.file_size]
+                    try:
+                        yield info.filename, view
+                    finally:
+                        view.release()
+                else:
+                    yield info.filename, zf.read(info)
+        finally:
+            if mm is not None:
+                mm.close()
+
+def _iter_tar_mmap(archive_path):
+    with open(archive_path, "rb") as f:
+        if not os.path.getsize(archive_path):
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            with tarfile.open(fileobj=f, mode="r:") as tf:
+                for member in tf:
+                    if not member.isfile() or not _is_page(member.name):
+                        continue
+                    view = memoryview(mm)[member.offset_data:member.offset_data + member.size]
+                    try:
+                        yield member.name, view
+                    finally:
+                        view.release()
+        finally:
+            mm.close()
+
+def _iter_tar_stream(archive_path):
+    # "r|*" 为流式模式，只能顺序读取，但无需随机访问整个压缩文件
+    with tarfile.open(archive_path, mode="r|*") as tf:
+        for member in tf:
+            if not member.isfile() or not _is_page(member.name):
+                continue
+            yield member.name, tf.extractfile(member).read()
+
+class ArchiveWriter:
+    """将生成的 ICS 文本写入 .zip 或 .tar.gz / .tgz 输出归档"""
+
+    def __init__(self, archive_path):
+        self.archive_path = archive_path
+        lower = archive_path.lower()
+        if lower.endswith(".zip"):
+            self._zip = zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_DEFLATED)
+            self._tar = None
+        elif lower.endswith((".tar.gz", ".tgz")):
+            self._zip = None
+            self._tar = tarfile.open(archive_path, "w:gz")
+        else:
+            raise ValueError(f"不支持的输出归档格式: {archive_path}")
+
+    def add(self, name, text):
+        """写入一个成员"""
+        data = text.encode("utf-8")
+        if self._zip is not None:
+            self._zip.writestr(name, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            self._tar.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+        else:
+            self._tar.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def ics_name_for(member_name):
+    """输出归档中的成员名：保留目录结构，扩展名改为 .ics"""
+    return os.path.splitext(member_name)[0] + ".ics"
+
+def convert_archive(input_path, output_path, semester_start, rest_weeks, templates=None):
+    """
+    将输入归档中的每个课表页面转换为 ICS 并写入输出归档
+    :param templates: 日程显示格式模板，见 Writer
+    :return: (成功数量, 失败数量)
+    """
+    done = failed = 0
+    started = time.time()
+    with ArchiveWriter(output_path) as out:
+        for name, data in iter_archive_pages(input_path):
+            try:
+                parsed = Parser(data, verbose=False).parse()
+                out.add(ics_name_for(name), Writer(parsed, semester_start, rest_weeks, templates).dumps())
+                done += 1
+            except Exception as e:
+                print(f"处理失败: {name}: {e}")
+                failed += 1
+
+    elapsed = time.time() - started
+    rate = (done + failed) / elapsed if elapsed > 0 else 0.0
+    print(f"处理完成：成功 {done} 页，失败 {failed} 页，{rate:.1f} 页/秒")
+    return done, failed
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="从归档中读取课表页面并生成 ICS 归档")
+    arg_parser.add_argument("input", help="输入归档（.zip / .tar / .tar.gz 等）")
+    arg_parser.add_argument("output", help="输出归档（.zip / .tar.gz）")
+    arg_parser.add_argument("--semester-start", help="教学周第一周周一的日期，如 20250224；为空时自动获取")
+    arg_parser.add_argument("--rest-weeks", default="", help="休息周信息，如 3,1,7,2")
+    arg_parser.add_argument("--templates", help="日程显示格式模板配置文件（JSON），见 event_template.py")
+    args = arg_parser.parse_args(argv)
+
+    if args.semester_start:
+        semester_start = datetime.strptime(args.semester_start, "%Y%m%d")
+        rest_weeks = parse_rest_weeks(args.rest_weeks)
+    else:
+        semester_start, rest_weeks = fetch_semester_info()
+
+    templates = load_templates(args.templates) if args.templates else None
+    convert_archive(args.input, args.output, semester_start, rest_weeks, templates)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+批量生成课表的任务队列（可断点续跑、可多机分片）
+
+任务状态保存在一个本地 sqlite 数据库中，多台机器只要共享同一文件系统，
+就可以同时运行 worker 认领分片。每个页面都记录内容哈希（页面内容 + 学期参数），
+重新入队时内容与参数均未变化且输出仍存在的页面会被跳过。
+
+用法示例：
+    python batch_job.py enqueue --db jobs.sqlite --pages pages --output out --semester-start 20250224 --rest-weeks 3,1
+    python batch_job.py work --db jobs.sqlite
+    python batch_job.py status --db jobs.sqlite
+
+注意：sqlite 的 WAL 模式不支持网络文件系统，这里使用默认的回滚日志模式，
+并依赖 sqlite 自身的文件锁完成分片认领。
+"""
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+from parser import Parser
+from ics_writer import Writer
+from semester_fetcher import fetch_semester_info, parse_rest_weeks
+from event_template import load_templates
+
+# 课表页面的扩展名
+HTML_SUFFIXES = (".html", ".htm")
+
+# 默认每次认领的页面数量
+DEFAULT_SHARD_SIZE = 20
+
+# 认领后超过该时间（秒）仍未完成的页面视为 worker 已崩溃，可被重新认领
+DEFAULT_LEASE_SECONDS = 600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    path TEXT PRIMARY KEY,
+    output_path TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    done_hash TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    claimed_at REAL,
+    finished_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_pages_status ON pages(status);
+"""
+
+def connect(db_path):
+    """打开任务数据库（isolation_level=None，由调用方显式控制事务）"""
+    conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+    conn.executescript(SCHEMA)
+    return conn
+
+def params_key(semester_start, rest_weeks, templates=None):
+    """学期参数（及显示格式模板）的规范化字符串，参与内容哈希计算"""
+    params = {
+        "semester_start": semester_start.strftime("%Y-%m-%d"),
+        "rest_weeks": [list(item) for item in rest_weeks],
+    }
+    if templates:
+        params["templates"] = templates
+    return json.dumps(params, sort_keys=True)
+
+def content_hash(html_bytes, key):
+    """页面内容与学期参数的联合哈希"""
+    h = hashlib.sha256()
+    h.update(key.encode("utf-8"))
+    h.update(b"\0")
+    h.update(html_bytes)
+    return h.hexdigest()
+
+def load_params(conn):
+    """读取入队时记录的学期参数，返回 (semester_start, rest_weeks, templates, key)"""
+    row = conn.execute("SELECT value FROM meta WHERE key = 'params'").fetchone()
+    if not row:
+        raise ValueError("任务数据库中没有学期参数，请先执行 enqueue")
+    params = json.loads(row[0])
+    semester_start = datetime.strptime(params["semester_start"], "%Y-%m-%d")
+    rest_weeks = [tuple(item) for item in params["rest_weeks"]]
+    return semester_start, rest_weeks, params.get("templates"), row[0]
+
+def iter_html_files(pages_dir):
+    """递归遍历目录下的课表 HTML 文件"""
+    for root, _, files in os.walk(pages_dir):
+        for name in sorted(files):
+            if name.lower().endswith(HTML_SUFFIXES):
+                yield os.path.join(root, name)
+
+def output_path_for(page_path, pages_dir, output_dir):
+    """按页面在 pages_dir 中的相对路径确定输出的 .ics 路径"""
+    rel = os.path.relpath(page_path, pages_dir)
+    return os.path.join(output_dir, os.path.splitext(rel)[0] + ".ics")
+
+def write_atomic(file_path, text):
+    """先写入同目录下的临时文件再替换，避免留下写了一半的输出"""
+    directory = os.path.dirname(file_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".ics")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def convert_page(source, output_path, semester_start, rest_weeks, templates=None):
+    """
+    解析单个课表页面并写出 ICS 文件
+    :param source: 页面路径、字节串或类文件对象
+    :param templates: 日程显示格式模板，见 Writer
+    """
+    data = Parser(source, verbose=False).parse()
+    writer = Writer(data, semester_start, rest_weeks, templates)
+    write_atomic(output_path, writer.dumps())
+
+def enqueue(db_path, pages_dir, output_dir, semester_start, rest_weeks, templates=None):
+    """
+    将目录下的课表页面加入队列
+    内容与学期参数均未变化、且输出文件仍存在的已完成页面保持 done 状态
+    :return: (新入队数量, 跳过数量)
+    """
+    conn = connect(db_path)
+    key = params_key(semester_start, rest_weeks, templates)
+    queued = skipped = 0
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('params', ?)", (key,))
+        for page_path in iter_html_files(pages_dir):
+            page_path = os.path.abspath(page_path)
+            out_path = os.path.abspath(output_path_for(page_path, pages_dir, output_dir))
+            with open(page_path, "rb") as f:
+                input_hash = content_hash(f.read(), key)
+
+            row = conn.execute(
+                "SELECT status, done_hash FROM pages WHERE path = ?", (page_path,)
+            ).fetchone()
+            if row and row[0] == "done" and row[1] == input_hash and os.path.exists(out_path):
+                skipped += 1
+                continue
+            if row and row[0] == "running":
+                # 正在处理的页面只更新哈希；worker 完成时若哈希不一致会将其重新置为 pending
+                conn.execute("UPDATE pages SET input_hash = ? WHERE path = ?", (input_hash, page_path))
+                queued += 1
+                continue
+
+            conn.execute(
+                """INSERT INTO pages (path, output_path, input_hash, status, attempts, error)
+                   VALUES (?, ?, ?, 'pending', 0, NULL)
+                   ON CONFLICT(path) DO UPDATE SET
+                       output_path = excluded.output_path,
+                       input_hash = excluded.input_hash,
+                       status = 'pending',
+                       worker = NULL,
+                       attempts = 0,
+                       error = NULL""",
+                (page_path, out_path, input_hash),
+            )
+            queued += 1
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    return queued, skipped
+
+def claim_shard(conn, worker_id, shard_size, lease_seconds):
+    """
+    认领一个分片：待处理页面，以及租约已过期的处理中页面
+    :return: [(页面路径, 输出路径, 认领时的 input_hash), ...]
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute(
+            """SELECT path, output_path, input_hash FROM pages
+               WHERE status = 'pending' OR (status = 'running' AND claimed_at < ?)
+               ORDER BY path LIMIT ?""",
+            (now - lease_seconds, shard_size),
+        ).fetchall()
+        conn.executemany(
+            """UPDATE pages SET status = 'running', worker = ?, claimed_at = ?,
+                   attempts = attempts + 1
+               WHERE path = ?""",
+            [(worker_id, now, path) for path, _, _ in rows],
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return rows
+
+def checkpoint(conn, worker_id, page_path, claimed_hash, processed_hash=None, error=None):
+    """
+    记录单个页面的处理结果；租约已被其他 worker 接管时不覆盖
+    处理期间页面被重新入队（input_hash 与认领时不同）时，页面重新置为 pending；
+    否则成功记为 done（入队后页面被直接修改时，以本次处理的哈希为准），失败记为 failed
+    :param claimed_hash: 认领时记录的 input_hash
+    :param processed_hash: 本次处理所用的页面内容与学期参数的哈希
+    """
+    if error is None:
+        conn.execute(
+            """UPDATE pages SET status = CASE WHEN input_hash IS ? THEN 'done' ELSE 'pending' END,
+                   input_hash = CASE WHEN input_hash IS ? THEN ? ELSE input_hash END,
+                   done_hash = ?, finished_at = ?, error = NULL
+               WHERE path = ? AND worker = ?""",
+            (claimed_hash, claimed_hash, processed_hash, processed_hash, time.time(), page_path, worker_id),
+        )
+    else:
+        conn.execute(
+            """UPDATE pages SET status = CASE WHEN input_hash IS ? THEN 'failed' ELSE 'pending' END,
+                   finished_at = ?, error = ?
+               WHERE path = ? AND worker = ?""",
+            (claimed_hash, time.time(), error, page_path, worker_id),
+        )
+
+def progress(conn):
+    """统计各状态的页面数量"""
+    counts = {"pending": 0, "running": 0, "done": 0, "failed": 0}
+    for status, count in conn.execute("SELECT status, COUNT(*) FROM pages GROUP BY status"):
+        counts[status] = count
+    return counts
+
+def run_worker(db_path, worker_id=None, shard_size=DEFAULT_SHARD_SIZE,
+               lease_seconds=DEFAULT_LEASE_SECONDS, report_interval=5.0):
+    """
+    循环认领分片并处理，直到队列中没有可认领的页面
+    :return: (成功数量, 失败数量)
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    conn = connect(db_path)
+
+    done = failed = 0
+    started = last_report = time.time()
+    try:
+        while True:
+            shard = claim_shard(conn, worker_id, shard_size, lease_seconds)
+            if not shard:
+                break
+            # 每个分片重新读取学期参数，运行期间重新 enqueue 修改的参数立即生效
+            semester_start, rest_weeks, templates, key = load_params(conn)
+            for page_path, out_path, claimed_hash in shard:
+                try:
+                    with open(page_path, "rb") as f:
+                        html_bytes = f.read()
+                    input_hash = content_hash(html_bytes, key)
+                    convert_page(html_bytes, out_path, semester_start, rest_weeks, templates)
+                    checkpoint(conn, worker_id, page_path, claimed_hash, input_hash)
+                    done += 1
+                except Exception as e:
+                    checkpoint(conn, worker_id, page_path, claimed_hash, error=f"{type(e).__name__}: {e}")
+                    print(f"处理失败: {page_path}: {e}")
+                    failed += 1
+
+                now = time.time()
+                if now - last_report >= report_interval:
+                    last_report = now
+                    report(conn, done + failed, now - started, worker_id)
+
+        report(conn, done + failed, time.time() - started, worker_id)
+    finally:
+        conn.close()
+
+    return done, failed
+
+def report(conn, processed, elapsed, worker_id):
+    """打印进度与本 worker 的吞吐量"""
+    counts = progress(conn)
+    total = sum(counts.values())
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"[{worker_id}] 已完成 {counts['done']}/{total}，失败 {counts['failed']}，"
+          f"处理中 {counts['running']}，本节点 {processed} 页，{rate:.1f} 页/秒")
+
+def print_status(db_path):
+    """打印整个任务的进度与总体吞吐量"""
+    conn = connect(db_path)
+    try:
+        counts = progress(conn)
+        total = sum(counts.values())
+        print(f"共 {total} 页：待处理 {counts['pending']}，处理中 {counts['running']}，"
+              f"已完成 {counts['done']}，失败 {counts['failed']}")
+
+        first, last, finished = conn.execute(
+            "SELECT MIN(claimed_at), MAX(finished_at), COUNT(*) FROM pages WHERE status = 'done'"
+        ).fetchone()
+        if finished and last and last > first:
+            print(f"总体吞吐量: {finished / (last - first):.1f} 页/秒")
+
+        for path, error in conn.execute("SELECT path, error FROM pages WHERE status = 'failed'"):
+            print(f"失败: {path}: {error}")
+    finally:
+        conn.close()
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="批量生成课表 ICS 文件")
+    sub = arg_parser.add_subparsers(dest="command", required=True)
+
+    p_enqueue = sub.add_parser("enqueue", help="将课表页面加入队列")
+    p_enqueue.add_argument("--db", required=True, help="任务数据库路径")
+    p_enqueue.add_argument("--pages", required=True, help="课表 HTML 所在目录")
+    p_enqueue.add_argument("--output", required=True, help="ICS 输出目录")
+    p_enqueue.add_argument("--semester-start", help="教学周第一周周一的日期，如 20250224；为空时自动获取")
+    p_enqueue.add_argument("--rest-weeks", default="", help="休息周信息，如 3,1,7,2")
+    p_enqueue.add_argument("--templates", help="日程显示格式模板配置文件（JSON），见 event_template.py")
+
+    p_work = sub.add_parser("work", help="认领分片并生成 ICS")
+    p_work.add_argument("--db", required=True, help="任务数据库路径")
+    p_work.add_argument("--worker-id", help="worker 标识，默认为 主机名-进程号")
+    p_work.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE, help="每次认领的页面数量")
+    p_work.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS, help="分片租约时长（秒）")
+
+    p_status = sub.add_parser("status", help="查看任务进度")
+    p_status.add_argument("--db", required=True, help="任务数据库路径")
+
+    args = arg_parser.parse_args(argv)
+
+    if args.command == "enqueue":
+        if args.semester_start:
+            semester_start = datetime.strptime(args.semester_start, "%Y%m%d")
+            rest_weeks = parse_rest_weeks(args.rest_weeks)
+        else:
+            semester_start, rest_weeks = fetch_semester_info()
+        templates = load_templates(args.templates) if args.templates else None
+        queued, skipped = enqueue(args.db, args.pages, args.output, semester_start, rest_weeks, templates)
+        print(f"已入队 {queued} 页，跳过未变化的 {skipped} 页")
+    elif args.command == "work":
+        done, failed = run_worker(args.db, args.worker_id, args.shard_size, args.lease)
+        print(f"处理完成：成功 {done} 页，失败 {failed} 页")
+    elif args.command == "status":
+        print_status(args.db)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+性能基准（回归测试用），使用固定随机种子生成的课程数据，不依赖课表页面
+
+用法示例：
+    python benchmark.py validator --timetables 200
+    python benchmark.py templates --events 100000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from ics_writer import Writer, TIME_SLOTS
+from ics_validator import validate_ics_lines
+from event_template import DEFAULT_TEMPLATES, compile_field_builder, compile_template
+
+# 基准使用的学期参数
+BENCH_SEMESTER_START = datetime(2025, 2, 24)
+BENCH_REST_WEEKS = [(3, 1), (9, 2)]
+
+BENCH_LOCATIONS = ["逸夫教学楼 YF415", "思源楼 SY207", "思源西楼 SX101", "第九教学楼 9-302"]
+
+def random_weeks(rng):
+    """随机生成三种周次格式之一"""
+    kind = rng.choice(["continuous", "discontinuous", "interval"])
+    if kind == "continuous":
+        start = rng.randint(1, 8)
+        return {"type": kind, "data": {"start": start, "end": rng.randint(start + 1, 18)}}
+    elif kind == "discontinuous":
+        return {"type": kind, "data": sorted(rng.sample(range(1, 19), rng.randint(2, 8)))}
+    return {"type": kind, "data": {"start": rng.randint(1, 2), "interval": 2, "count": rng.randint(3, 8)}}
+
+def random_timetable(rng, courses=15):
+    """随机生成一份课表数据，格式与 Parser.parse 的返回值一致"""
+    data = []
+    for i in range(courses):
+        data.append({
+            "course_id": f"M{rng.randint(100000, 999999)}B",
+            "class_id": f"{rng.randint(1, 12):02d}",
+            "name": f"课程{i}",
+            "time": {"weekday": rng.randint(1, 7), "lesson": rng.randint(1, len(TIME_SLOTS))},
+            "teacher": f"教师{rng.randint(1, 50)}",
+            "location": rng.choice(BENCH_LOCATIONS),
+            "weeks": random_weeks(rng),
+        })
+    return data
+
+def bench_validator(timetables=200, seed=0):
+    """生成 ICS 后逐份校验，返回 (份数/秒, 日程数/秒)"""
+    rng = random.Random(seed)
+    cohort = []
+    for _ in range(timetables):
+        data = random_timetable(rng)
+        cohort.append((data, Writer(data, BENCH_SEMESTER_START, BENCH_REST_WEEKS).dumps()))
+
+    events = 0
+    started = time.perf_counter()
+    for data, text in cohort:
+        problems = validate_ics_lines(text.splitlines(), data, BENCH_SEMESTER_START, BENCH_REST_WEEKS)
+        if problems:
+            raise AssertionError(f"校验未通过: {problems}")
+        events += len(data)
+    elapsed = time.perf_counter() - started
+
+    print(f"validator: {timetables} 份课表，{elapsed:.3f} 秒，"
+          f"{timetables / elapsed:.1f} 份/秒，{events / elapsed:.0f} 日程/秒")
+    return timetables / elapsed, events / elapsed
+
+# 模板基准使用的自定义格式（用到所有需要计算的字段）
+BENCH_CUSTOM_TEMPLATE = "{name}（{room}）{weekday_name} {start_time}-{end_time} {weeks} {actual_weeks}"
+
+def bench_templates(events=100000, seed=0):
+    """
+    比较日程名称的生成方式，返回 {方式: 日程数/秒}
+    - hardcoded: 原先硬编码的 f"{course_name} - {teacher}"
+    - compiled: 默认模板编译后的函数（Writer 的实际路径，含构造字段）
+    - format_map: 构造相同字段后，每个日程重新解析模板字符串（作为对照）
+    - compiled_custom / format_map_custom: 使用全部计算字段的自定义模板
+    """
+    rng = random.Random(seed)
+    courses = random_timetable(rng, courses=200)
+    batch = [courses[i % len(courses)] for i in range(events)]
+    actual_weeks = list(range(1, 17))
+    duration = timedelta(minutes=110)
+
+    def run_hardcoded():
+        for course in batch:
+            f"{course['name']} - {course['teacher']}"
+
+    def run_compiled(template):
+        formatter = compile_template(template)
+        build_fields = compile_field_builder(formatter.fields)
+        for course in batch:
+            formatter(build_fields(course, actual_weeks, "08:00", duration))
+
+    def run_format_map(template):
+        build_fields = compile_field_builder(compile_template(template).fields)
+        for course in batch:
+            template.format_map(build_fields(course, actual_weeks, "08:00", duration))
+
+    cases = [
+        ("hardcoded", run_hardcoded),
+        ("compiled", lambda: run_compiled(DEFAULT_TEMPLATES["summary"])),
+        ("format_map", lambda: run_format_map(DEFAULT_TEMPLATES["summary"])),
+        ("compiled_custom", lambda: run_compiled(BENCH_CUSTOM_TEMPLATE)),
+        ("format_map_custom", lambda: run_format_map(BENCH_CUSTOM_TEMPLATE)),
+    ]
+    results = {}
+    for name, run in cases:
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+        results[name] = events / elapsed
+        print(f"templates/{name}: {events} 个日程，{elapsed:.3f} 秒，{results[name]:.0f} 日程/秒")
+    return results
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="性能基准")
+    sub = arg_parser.add_subparsers(dest="command", required=True)
+
+    p_validator = sub.add_parser("validator", help="ICS 校验的吞吐量")
+    p_validator.add_argument("--timetables", type=int, default=200, help="课表份数")
+    p_validator.add_argument("--seed", type=int, default=0, help="随机种子")
+
+    p_templates = sub.add_parser("templates", help="日程名称模板与硬编码格式的对比")
+    p_templates.add_argument("--events", type=int, default=100000, help="日程数量")
+    p_templates.add_argument("--seed", type=int, default=0, help="随机种子")
+
+    args = arg_parser.parse_args(argv)
+    if args.command == "validator":
+        bench_validator(args.timetables, args.seed)
+    elif args.command == "templates":
+        bench_templates(args.events, args.seed)
+
+if __name__ == "__main__":
+    main()
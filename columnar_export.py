@@ -0,0 +1,251 @@
+"""
+将一批课表的解析结果导出为列式文件（Arrow IPC 或 Parquet），供统计分析使用，
+避免每次统计都重新解析 HTML 或 ICS
+
+每门课的每个上课时段为一行，周次同时以展开列表与位掩码（第 w 周对应第 w-1 位）保存。
+解析结果按 chunk_rows 行分块写出，内存占用与批次大小无关。
+Arrow IPC 文件（.arrow）可通过内存映射零拷贝读取；Parquet 文件（.parquet）体积更小。
+
+需要安装 pyarrow：pip install pyarrow
+
+用法示例：
+    python columnar_export.py export --pages pages --output cohort.arrow --semester-start 20250224 --rest-weeks 3,1
+    python columnar_export.py export --archive pages.zip --output cohort.parquet --semester-start 20250224
+    python columnar_export.py stats cohort.arrow
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from parser import Parser, expand_weeks
+from ics_writer import Writer
+from batch_job import iter_html_files
+from archive_io import iter_archive_pages
+from semester_fetcher import fetch_semester_info, parse_rest_weeks
+
+# 每个数据块的行数
+DEFAULT_CHUNK_ROWS = 50000
+
+# 位掩码能表示的最大周次
+MAX_MASK_WEEK = 64
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("列式导出需要安装 pyarrow：pip install pyarrow")
+
+def timetable_schema(semester_start, rest_weeks):
+    """导出文件的表结构，学期参数记录在表的元数据中"""
+    _require_pyarrow()
+    return pa.schema([
+        ("source", pa.string()),
+        ("course_id", pa.string()),
+        ("class_id", pa.string()),
+        ("name", pa.string()),
+        ("teacher", pa.string()),
+        ("location", pa.string()),
+        ("building", pa.string()),
+        ("room", pa.string()),
+        ("weekday", pa.int8()),
+        ("lesson", pa.int8()),
+        ("weeks_type", pa.string()),
+        ("weeks", pa.list_(pa.int16())),
+        ("weeks_mask", pa.uint64()),
+        ("actual_weeks", pa.list_(pa.int16())),
+        ("actual_weeks_mask", pa.uint64()),
+    ], metadata={
+        "semester_start": semester_start.strftime("%Y-%m-%d"),
+        "rest_weeks": ",".join(f"{after},{count}" for after, count in rest_weeks),
+    })
+
+def weeks_to_mask(weeks):
+    """周次列表转为位掩码；超出 MAX_MASK_WEEK 时返回 None"""
+    mask = 0
+    for week in weeks:
+        if not 1 <= week <= MAX_MASK_WEEK:
+            return None
+        mask |= 1 << (week - 1)
+    return mask
+
+class ColumnarExporter:
+    """按块累积解析结果并写入 Arrow IPC / Parquet 文件"""
+
+    def __init__(self, output_path, semester_start, rest_weeks=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """
+        :param output_path: 输出路径，.parquet 写 Parquet，其余（如 .arrow）写 Arrow IPC 文件
+        :param semester_start: 学期开始日期 (datetime 类型)
+        :param rest_weeks: 休息周信息列表，格式为 [(after_week, rest_count), ...]
+        :param chunk_rows: 每块的行数
+        """
+        _require_pyarrow()
+        self.output_path = output_path
+        self.rest_weeks = rest_weeks if rest_weeks else []
+        self.chunk_rows = chunk_rows
+        self.schema = timetable_schema(semester_start, self.rest_weeks)
+        # 只用于计算实际周次，与生成 ICS 时的周次映射保持一致
+        self._week_mapper = Writer([], semester_start, self.rest_weeks)
+        self._columns = {name: [] for name in self.schema.names}
+        self.rows = 0
+
+        if output_path.lower().endswith(".parquet"):
+            self._writer = pq.ParquetWriter(output_path, self.schema)
+        else:
+            self._sink = pa.OSFile(output_path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+
+    def add(self, source, data):
+        """
+        添加一份课表的解析结果
+        :param source: 课表来源（文件名或归档成员名）
+        :param data: Parser.parse 的返回值
+        """
+        columns = self._columns
+        for course in data:
+            building, _, room = course["location"].partition(" ")
+            weeks = expand_weeks(course["weeks"])
+            actual_weeks = self._week_mapper.get_all_actual_weeks_for_course(course["weeks"])
+
+            columns["source"].append(source)
+            columns["course_id"].append(course["course_id"])
+            columns["class_id"].append(course["class_id"])
+            columns["name"].append(course["name"])
+            columns["teacher"].append(course["teacher"])
+            columns["location"].append(course["location"])
+            columns["building"].append(building)
+            columns["room"].append(room)
+            columns["weekday"].append(course["time"]["weekday"])
+            columns["lesson"].append(course["time"]["lesson"])
+            columns["weeks_type"].append(course["weeks"]["type"])
+            columns["weeks"].append(weeks)
+            columns["weeks_mask"].append(weeks_to_mask(weeks))
+            columns["actual_weeks"].append(actual_weeks)
+            columns["actual_weeks_mask"].append(weeks_to_mask(actual_weeks))
+            self.rows += 1
+
+        if len(columns["source"]) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        """将已累积的行写为一个数据块（Parquet 中为一个 row group）"""
+        if not self._columns["source"]:
+            return
+        batch = pa.RecordBatch.from_pydict(self._columns, schema=self.schema)
+        if isinstance(self._writer, pq.ParquetWriter):
+            self._writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self._writer.write_batch(batch)
+        self._columns = {name: [] for name in self.schema.names}
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+        if not isinstance(self._writer, pq.ParquetWriter):
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def load_table(path):
+    """
+    读取导出文件
+    Arrow IPC 文件通过内存映射读取，列数据直接引用映射的内存，不做拷贝；
+    Parquet 需要解码，同样使用内存映射减少读取开销
+    """
+    _require_pyarrow()
+    if path.lower().endswith(".parquet"):
+        return pq.read_table(path, memory_map=True)
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+def export_pages(sources, output_path, semester_start, rest_weeks, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    解析一批课表页面并导出
+    :param sources: 可迭代的 (来源名称, 页面路径/字节串/类文件对象)
+    :return: (成功页数, 失败页数, 行数)
+    """
+    done = failed = 0
+    started = time.time()
+    with ColumnarExporter(output_path, semester_start, rest_weeks, chunk_rows) as exporter:
+        for name, source in sources:
+            try:
+                exporter.add(name, Parser(source, verbose=False).parse())
+                done += 1
+            except Exception as e:
+                print(f"解析失败: {name}: {e}")
+                failed += 1
+        rows = exporter.rows
+
+    elapsed = time.time() - started
+    rate = (done + failed) / elapsed if elapsed > 0 else 0.0
+    print(f"导出完成：{done} 页，{rows} 行，失败 {failed} 页，{rate:.1f} 页/秒 -> {output_path}")
+    return done, failed, rows
+
+def print_stats(table):
+    """打印常用统计：教师授课时段数、课程人数、各周上课时段数"""
+    print(f"共 {table.num_rows} 行，{len(pc.unique(table['source']))} 份课表")
+
+    # 同一教学班在每份课表中都会出现，去重后才是教师实际承担的授课时段
+    sessions = table.select(["teacher", "course_id", "class_id", "weekday", "lesson"]).group_by(
+        ["teacher", "course_id", "class_id", "weekday", "lesson"]).aggregate([])
+    load = sessions.group_by("teacher").aggregate([("course_id", "count")]).sort_by(
+        [("course_id_count", "descending")])
+    print("\n教师每周授课时段数（前 10）：")
+    for row in load.slice(0, 10).to_pylist():
+        print(f"  {row['teacher']}: {row['course_id_count']}")
+
+    sizes = table.group_by(["course_id", "class_id"]).aggregate([("source", "count_distinct")]).sort_by(
+        [("source_count_distinct", "descending")])
+    print("\n教学班人数（前 10）：")
+    for row in sizes.slice(0, 10).to_pylist():
+        print(f"  {row['course_id']} [{row['class_id']}]: {row['source_count_distinct']}")
+
+    weeks = pc.list_flatten(table["actual_weeks"])
+    distribution = pc.value_counts(weeks).to_pylist()
+    print("\n各实际周次的上课时段数：")
+    for item in sorted(distribution, key=lambda item: item["values"]):
+        print(f"  第{item['values']}周: {item['counts']}")
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="导出课表解析结果为列式文件")
+    sub = arg_parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="解析课表并导出")
+    source_group = p_export.add_mutually_exclusive_group(required=True)
+    source_group.add_argument("--pages", help="课表 HTML 所在目录")
+    source_group.add_argument("--archive", help="课表归档（.zip / .tar / .tar.gz 等）")
+    p_export.add_argument("--output", required=True, help="输出文件（.arrow 或 .parquet）")
+    p_export.add_argument("--semester-start", help="教学周第一周周一的日期，如 20250224；为空时自动获取")
+    p_export.add_argument("--rest-weeks", default="", help="休息周信息，如 3,1,7,2")
+    p_export.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="每个数据块的行数")
+
+    p_stats = sub.add_parser("stats", help="打印导出文件的统计信息")
+    p_stats.add_argument("path", help="导出文件路径")
+
+    args = arg_parser.parse_args(argv)
+
+    if args.command == "export":
+        if args.semester_start:
+            semester_start = datetime.strptime(args.semester_start, "%Y%m%d")
+            rest_weeks = parse_rest_weeks(args.rest_weeks)
+        else:
+            semester_start, rest_weeks = fetch_semester_info()
+
+        if args.pages:
+            sources = ((os.path.relpath(path, args.pages), path) for path in iter_html_files(args.pages))
+        else:
+            sources = iter_archive_pages(args.archive)
+        export_pages(sources, args.output, semester_start, rest_weeks, args.chunk_rows)
+    elif args.command == "stats":
+        print_stats(load_table(args.path))
+
+if __name__ == "__main__":
+    main()
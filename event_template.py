@@ -0,0 +1,193 @@
+"""
+日程名称、地点、描述的显示格式模板
+
+模板使用 str.format 语法，例如 "{name} - {teacher}"、"{room}（{building}）"。
+每个模板只解析、校验一次并编译为格式化函数（带缓存），同一批次内所有日程复用。
+
+可用字段见 TEMPLATE_FIELDS；配置文件为 JSON，例如：
+    {"summary": "{name}（{room}）", "description": "{course_id} [{class_id}] {teacher}\\n周次：{weeks}"}
+"""
+import json
+import string
+from datetime import datetime, timedelta
+from functools import lru_cache
+from operator import itemgetter
+
+from parser import expand_weeks
+
+# 默认模板，与此前硬编码的格式一致；description 为空时不输出 DESCRIPTION
+DEFAULT_TEMPLATES = {
+    "summary": "{name} - {teacher}",
+    "location": "{location}",
+    "description": "",
+}
+
+# 模板中可以使用的字段
+TEMPLATE_FIELDS = {
+    "course_id": "课程号，如 M402004B",
+    "class_id": "课序号，如 03",
+    "name": "课程名称",
+    "teacher": "教师",
+    "location": "完整地点，如 逸夫教学楼 YF415",
+    "building": "教学楼，如 逸夫教学楼",
+    "room": "教室，如 YF415",
+    "weekday": "星期几（数字 1-7）",
+    "weekday_name": "星期几，如 周一",
+    "lesson": "第几大节（数字）",
+    "start_time": "上课时间，如 08:00",
+    "end_time": "下课时间，如 09:50",
+    "weeks": "教学周次，如 1-16周、2, 4, 6周",
+    "actual_weeks": "包含休息周在内的实际周次，如 1-3, 5-17",
+}
+
+WEEKDAY_NAMES = {1: "周一", 2: "周二", 3: "周三", 4: "周四", 5: "周五", 6: "周六", 7: "周日"}
+
+_FORMATTER = string.Formatter()
+
+# str.format 支持的转换符
+_CONVERSIONS = ("r", "s", "a")
+
+def _escape_literal(literal):
+    return literal.replace("{", "{{").replace("}", "}}")
+
+@lru_cache(maxsize=None)
+def compile_template(template):
+    """
+    将模板编译为 fields -> str 的函数，编译结果按模板字符串缓存
+    模板在编译时校验并改写为只含位置参数的格式串（如 "{} - {}"），字段值用 itemgetter 一次取出；
+    速度与直接调用 format_map 相当（字段较多时略快），主要开销在于构造字段，见 compile_field_builder
+    返回的函数带有 fields 属性，为模板用到的字段集合
+    """
+    pieces = []
+    keys = []
+    for literal, field, spec, conversion in _FORMATTER.parse(template):
+        pieces.append(_escape_literal(literal))
+        if field is None:
+            continue
+        if field not in TEMPLATE_FIELDS:
+            raise ValueError(f"未知的模板字段: {{{field}}}，可用字段: {', '.join(TEMPLATE_FIELDS)}")
+        if conversion is not None and conversion not in _CONVERSIONS:
+            raise ValueError(f"模板中的转换符无效: !{conversion}，可用转换符: !r、!s、!a")
+        if spec and "{" in spec:
+            raise ValueError(f"模板不支持嵌套字段: {template}")
+        keys.append(field)
+        pieces.append("{" + (f"!{conversion}" if conversion else "") + (f":{spec}" if spec else "") + "}")
+    positional = "".join(pieces).format
+
+    if not keys:
+        text = positional()
+        formatter = lambda fields: text
+    elif len(keys) == 1:
+        key = keys[0]
+        formatter = lambda fields: positional(fields[key])
+    else:
+        getter = itemgetter(*keys)
+        formatter = lambda fields: positional(*getter(fields))
+    formatter.fields = frozenset(keys)
+    return formatter
+
+def load_templates(config):
+    """
+    读取模板配置，返回 {"summary": str, "location": str, "description": str}
+    :param config: 配置字典，或 JSON 配置文件路径；缺省的项使用默认模板
+    """
+    if isinstance(config, str):
+        with open(config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    unknown = set(config) - set(DEFAULT_TEMPLATES)
+    if unknown:
+        raise ValueError(f"未知的模板项: {', '.join(sorted(unknown))}，可用项: {', '.join(DEFAULT_TEMPLATES)}")
+
+    templates = dict(DEFAULT_TEMPLATES)
+    templates.update(config)
+    # 用示例课程试填一次，提前发现字段名、转换符以及与字段类型不符的格式说明符（如 {weekday:s}）
+    sample = compile_field_builder(frozenset(TEMPLATE_FIELDS))(*_SAMPLE_ARGS)
+    for name, template in templates.items():
+        try:
+            compile_template(template)(sample)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"模板 {name} 无效: {template!r}: {e}") from e
+    return templates
+
+def format_week_ranges(weeks):
+    """将有序周次列表压缩为区间描述，如 [1, 2, 3, 5] -> "1-3, 5" """
+    ranges = []
+    start = prev = None
+    for week in weeks:
+        if start is None:
+            start = prev = week
+        elif week == prev + 1:
+            prev = week
+        else:
+            ranges.append(f"{start}-{prev}" if start != prev else f"{start}")
+            start = prev = week
+    if start is not None:
+        ranges.append(f"{start}-{prev}" if start != prev else f"{start}")
+    return ", ".join(ranges)
+
+def describe_weeks(weeks_data):
+    """按课程数据中的周次格式生成描述"""
+    if weeks_data["type"] == "continuous":
+        return f"{weeks_data['data']['start']}-{weeks_data['data']['end']}周"
+    weeks = expand_weeks(weeks_data)
+    return ", ".join(str(week) for week in weeks) + "周" if weeks else ""
+
+@lru_cache(maxsize=64)
+def _end_time(start_time, duration):
+    """下课时间；节次只有少数几种，结果缓存以避免逐个日程解析时间"""
+    return (datetime.strptime(start_time, "%H:%M") + duration).strftime("%H:%M")
+
+# 直接取自课程数据的字段
+_COURSE_KEYS = ("course_id", "class_id", "name", "teacher", "location")
+
+# 校验模板用的示例参数，格式与 Writer 调用字段构造函数时一致
+_SAMPLE_ARGS = (
+    {
+        "course_id": "M402004B",
+        "class_id": "03",
+        "name": "示例课程",
+        "time": {"weekday": 1, "lesson": 1},
+        "teacher": "示例教师",
+        "location": "逸夫教学楼 YF415",
+        "weeks": {"type": "continuous", "data": {"start": 1, "end": 16}},
+    },
+    list(range(1, 17)),
+    "08:00",
+    timedelta(minutes=110),
+)
+
+# 需要计算的字段：(course, actual_weeks, start_time, duration) -> 值
+_COMPUTED_FIELDS = {
+    "building": lambda course, weeks, start, duration: course["location"].partition(" ")[0],
+    "room": lambda course, weeks, start, duration: course["location"].partition(" ")[2],
+    "weekday": lambda course, weeks, start, duration: course["time"]["weekday"],
+    "weekday_name": lambda course, weeks, start, duration: WEEKDAY_NAMES.get(course["time"]["weekday"], ""),
+    "lesson": lambda course, weeks, start, duration: course["time"]["lesson"],
+    "start_time": lambda course, weeks, start, duration: start,
+    "end_time": lambda course, weeks, start, duration: _end_time(start, duration),
+    "weeks": lambda course, weeks, start, duration: describe_weeks(course["weeks"]),
+    "actual_weeks": lambda course, weeks, start, duration: format_week_ranges(weeks),
+}
+
+@lru_cache(maxsize=None)
+def compile_field_builder(needed):
+    """
+    生成构造模板字段的函数，只计算 needed 中用到的字段
+    :param needed: 模板用到的字段集合（frozenset，compile_template(...).fields 的并集）
+    :return: (course, actual_weeks, start_time, duration) -> fields 的函数，
+             其中 start_time 形如 "08:00"，duration 为 timedelta；
+             只用到课程数据中的字段（如默认的 "{name} - {teacher}"）时直接返回 course，不构造新字典
+    """
+    if needed <= frozenset(_COURSE_KEYS):
+        return lambda course, actual_weeks, start_time, duration: course
+
+    course_keys = tuple(key for key in _COURSE_KEYS if key in needed)
+    computed = tuple((key, getter) for key, getter in _COMPUTED_FIELDS.items() if key in needed)
+
+    def build(course, actual_weeks, start_time, duration):
+        fields = {key: course.get(key, "") for key in course_keys}
+        for key, getter in computed:
+            fields[key] = getter(course, actual_weeks, start_time, duration)
+        return fields
+
+    return build
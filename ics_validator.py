@@ -0,0 +1,280 @@
+"""
+ICS 输出校验：展开 DTSTART/RRULE/EXDATE 得到每个日程的实际上课时间，
+与根据课程数据独立推算出的上课时间逐一比对
+
+展开逻辑不依赖 ics 库，只支持本项目生成的 FREQ=WEEKLY 规则（INTERVAL/COUNT/UNTIL/BYDAY）。
+预期时间根据课程的逻辑周次与休息周信息重新计算，不复用 Writer 的周次映射，
+因此可以发现 get_all_actual_weeks_for_course / get_rrule_from_actual_weeks 中的错误。
+
+用法示例：
+    python ics_validator.py --pages pages --output out --semester-start 20250224 --rest-weeks 3,1
+"""
+import argparse
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytz
+
+from parser import Parser, expand_weeks
+from ics_writer import SHANGHAI_TZ, TIME_SLOTS, STAGGERED_KEYWORD, STAGGERED_TIME_SLOTS, WEEKDAY_MAP
+from batch_job import iter_html_files, output_path_for
+from semester_fetcher import fetch_semester_info, parse_rest_weeks
+
+# iCalendar 星期缩写到 weekday() 的映射（0=周一）
+BYDAY_INDEX = {code: weekday - 1 for weekday, code in WEEKDAY_MAP.items()}
+
+# 防止错误规则无限展开
+MAX_OCCURRENCES = 1000
+
+def iter_vevents(lines):
+    """
+    流式读取 ICS 文本行，逐个产出 VEVENT 的属性
+    每个事件为 {属性名: [(参数字典, 值), ...]}
+    """
+    event = None
+    pending = None
+
+    def flush(line):
+        name_part, _, value = line.partition(":")
+        name, *params = name_part.split(";")
+        param_dict = dict(p.split("=", 1) for p in params if "=" in p)
+        event.setdefault(name.upper(), []).append((param_dict, value))
+
+    for raw in lines:
+        line = raw.rstrip("\r\n")
+        if line[:1] in (" ", "\t"):
+            # 折行：续接到上一行
+            if pending is not None:
+                pending += line[1:]
+            continue
+
+        if pending is not None and event is not None:
+            flush(pending)
+        pending = None
+
+        if line == "BEGIN:VEVENT":
+            event = {}
+        elif line == "END:VEVENT":
+            if event is not None:
+                yield event
+            event = None
+        elif event is not None and line:
+            pending = line
+
+def parse_ics_datetime(value, params=None):
+    """解析 DTSTART/EXDATE 的值，返回带时区的 datetime（UTC 或 TZID 指定的时区）"""
+    params = params or {}
+    if len(value) == 16 and value[8] == "T" and value[15] == "Z":
+        # 最常见的 UTC 格式，手工切片比 strptime 快一个数量级
+        return datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]),
+                        int(value[9:11]), int(value[11:13]), int(value[13:15]), tzinfo=pytz.utc)
+    if "T" in value:
+        dt = datetime.strptime(value, "%Y%m%dT%H%M%S")
+    else:
+        dt = datetime.strptime(value, "%Y%m%d")
+    tz = pytz.timezone(params["TZID"]) if "TZID" in params else SHANGHAI_TZ
+    return tz.localize(dt)
+
+def parse_rrule(value):
+    """将 RRULE 字符串解析为字典"""
+    return dict(part.split("=", 1) for part in value.split(";") if "=" in part)
+
+def expand_event(dtstart, rrule=None, exdates=()):
+    """
+    展开单个日程，返回实际发生时间的集合
+    按 RFC 5545，BYDAY 在 DTSTART 所在时区内计算，COUNT 在排除 EXDATE 之前计数
+    """
+    if not rrule:
+        occurrences = {dtstart}
+    else:
+        rule = parse_rrule(rrule)
+        if rule.get("FREQ") != "WEEKLY":
+            raise ValueError(f"不支持的 RRULE: {rrule}")
+
+        interval = int(rule.get("INTERVAL", 1))
+        count = int(rule["COUNT"]) if "COUNT" in rule else None
+        until = parse_ics_datetime(rule["UNTIL"]) if "UNTIL" in rule else None
+        if count is None and until is None:
+            raise ValueError(f"RRULE 缺少 COUNT 或 UNTIL: {rrule}")
+        if "BYDAY" in rule:
+            weekdays = sorted(BYDAY_INDEX[day] for day in rule["BYDAY"].split(","))
+        else:
+            weekdays = [dtstart.weekday()]
+
+        occurrences = set()
+        generated = 0
+        week_start = dtstart - timedelta(days=dtstart.weekday())
+        while generated < MAX_OCCURRENCES:
+            done = False
+            for weekday in weekdays:
+                occurrence = week_start + timedelta(days=weekday)
+                if occurrence < dtstart:
+                    continue
+                if until is not None and occurrence > until:
+                    done = True
+                    break
+                occurrences.add(occurrence)
+                generated += 1
+                if count is not None and generated >= count:
+                    done = True
+                    break
+            if done:
+                break
+            week_start += timedelta(weeks=interval)
+
+    return occurrences - set(exdates)
+
+def expand_vevent(event):
+    """展开 iter_vevents 产出的事件，返回 (发生时间集合, 日程名称)"""
+    params, value = event["DTSTART"][0]
+    dtstart = parse_ics_datetime(value, params)
+    rrule = event["RRULE"][0][1] if "RRULE" in event else None
+    exdates = [
+        parse_ics_datetime(item, params)
+        for params, value in event.get("EXDATE", [])
+        for item in value.split(",")
+    ]
+    name = event["SUMMARY"][0][1] if "SUMMARY" in event else ""
+    return expand_event(dtstart, rrule, exdates), name
+
+def expected_actual_weeks(weeks_data, rest_weeks):
+    """
+    逻辑周次加上之前所有休息周的数量即为实际周次；
+    课程若在某个休息周前的最后一周上课，紧随其后的休息周同样排课
+    """
+    actual_weeks = set()
+    for logical_week in expand_weeks(weeks_data):
+        actual_week = logical_week + sum(count for after, count in rest_weeks if after < logical_week)
+        actual_weeks.add(actual_week)
+        for after, count in rest_weeks:
+            if after == logical_week:
+                actual_weeks.update(actual_week + i for i in range(1, count + 1))
+    return sorted(actual_weeks)
+
+def expected_occurrences(course, semester_start, rest_weeks):
+    """根据课程数据推算所有上课开始时间（UTC），无效节次返回空集合"""
+    location = course["location"]
+    lesson = course["time"]["lesson"]
+    weekday = course["time"]["weekday"]
+    if any(keyword in location for keyword in STAGGERED_KEYWORD):
+        start_time = STAGGERED_TIME_SLOTS.get(lesson)
+    else:
+        start_time = TIME_SLOTS.get(lesson)
+    if not start_time:
+        return set()
+
+    weeks = expected_actual_weeks(course["weeks"], rest_weeks)
+    if not weeks:
+        return set()
+
+    hour, minute = map(int, start_time.split(":"))
+    first_day = datetime(semester_start.year, semester_start.month, semester_start.day, hour, minute)
+    local_times = [first_day + timedelta(days=(week - 1) * 7 + (weekday - 1)) for week in weeks]
+
+    # 首末两次的 UTC 偏移相同时（Asia/Shanghai 无夏令时），整门课共用一个偏移，避免逐个 localize
+    first_offset = SHANGHAI_TZ.localize(local_times[0]).utcoffset()
+    if SHANGHAI_TZ.localize(local_times[-1]).utcoffset() == first_offset:
+        return {(local - first_offset).replace(tzinfo=pytz.utc) for local in local_times}
+    return {SHANGHAI_TZ.localize(local).astimezone(pytz.utc) for local in local_times}
+
+def _fmt(dt):
+    return dt.astimezone(SHANGHAI_TZ).strftime("%Y-%m-%d %H:%M")
+
+def validate_ics_lines(lines, data, semester_start, rest_weeks):
+    """
+    比对一份 ICS 与课程数据
+    日程与课程按发生时间集合匹配，与日程名称、地点的显示格式无关
+    :return: 问题描述列表，为空表示通过
+    """
+    expected = {}
+    for course in data:
+        occurrences = frozenset(expected_occurrences(course, semester_start, rest_weeks))
+        if occurrences:
+            expected.setdefault(occurrences, []).append(course["name"])
+
+    actual = Counter()
+    names = {}
+    problems = []
+    for event in iter_vevents(lines):
+        try:
+            occurrences, name = expand_vevent(event)
+        except (KeyError, ValueError) as e:
+            problems.append(f"无法展开日程: {e}")
+            continue
+        occurrences = frozenset(occurrences)
+        actual[occurrences] += 1
+        names.setdefault(occurrences, name)
+
+    expected_counter = Counter({occ: len(courses) for occ, courses in expected.items()})
+    missing = list((expected_counter - actual).elements())
+    extra = list((actual - expected_counter).elements())
+
+    for occurrences in missing:
+        course_name = expected[occurrences][0]
+        # 找到重合最多的多余日程，给出具体差异
+        best = max(extra, key=lambda occ: len(occ & occurrences), default=None)
+        if best is not None and best & occurrences:
+            extra.remove(best)
+            lacking = ", ".join(_fmt(dt) for dt in sorted(occurrences - best))
+            surplus = ", ".join(_fmt(dt) for dt in sorted(best - occurrences))
+            problems.append(f"{course_name}: 缺少 [{lacking}]，多出 [{surplus}]")
+        else:
+            problems.append(f"{course_name}: 未找到对应日程")
+    for occurrences in extra:
+        if occurrences:
+            problems.append(f"多余日程 {names[occurrences]}: 首次上课 {_fmt(min(occurrences))}")
+        else:
+            problems.append(f"多余日程 {names[occurrences]}: 没有任何上课时间")
+
+    return problems
+
+def validate_directory(pages_dir, output_dir, semester_start, rest_weeks):
+    """
+    逐个页面校验输出目录中的 ICS 文件（流式处理，不在内存中保留整批数据）
+    依次产出 (页面路径, 问题列表)
+    """
+    for page_path in iter_html_files(pages_dir):
+        ics_path = output_path_for(page_path, pages_dir, output_dir)
+        try:
+            data = Parser(page_path, verbose=False).parse()
+            with open(ics_path, "r", encoding="utf-8") as f:
+                problems = validate_ics_lines(f, data, semester_start, rest_weeks)
+        except FileNotFoundError:
+            problems = [f"缺少输出文件 {ics_path}"]
+        except Exception as e:
+            problems = [f"校验失败: {e}"]
+        yield page_path, problems
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="校验生成的 ICS 文件与课表页面是否一致")
+    arg_parser.add_argument("--pages", required=True, help="课表 HTML 所在目录")
+    arg_parser.add_argument("--output", required=True, help="ICS 输出目录")
+    arg_parser.add_argument("--semester-start", help="教学周第一周周一的日期，如 20250224；为空时自动获取")
+    arg_parser.add_argument("--rest-weeks", default="", help="休息周信息，如 3,1,7,2")
+    args = arg_parser.parse_args(argv)
+
+    if args.semester_start:
+        semester_start = datetime.strptime(args.semester_start, "%Y%m%d")
+        rest_weeks = parse_rest_weeks(args.rest_weeks)
+    else:
+        semester_start, rest_weeks = fetch_semester_info()
+
+    checked = failed = 0
+    started = time.time()
+    for page_path, problems in validate_directory(args.pages, args.output, semester_start, rest_weeks):
+        checked += 1
+        if problems:
+            failed += 1
+            print(f"{page_path}:")
+            for problem in problems:
+                print(f"  {problem}")
+
+    elapsed = time.time() - started
+    rate = checked / elapsed if elapsed > 0 else 0.0
+    print(f"校验完成：共 {checked} 个文件，{failed} 个有问题，{rate:.1f} 个/秒")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,9 @@ from tkinter import filedialog
 import ctypes
 import os
 
+from parser import expand_weeks
+from event_template import DEFAULT_TEMPLATES, compile_field_builder, compile_template, load_templates
+
 # 添加时区 Asia/Shanghai
 SHANGHAI_TZ = pytz.timezone("Asia/Shanghai")
 
@@ -46,16 +49,30 @@ WEEKDAY_MAP = {
 }
 
 class Writer:
-    def __init__(self, data, semester_start, rest_weeks=None):
+    def __init__(self, data, semester_start, rest_weeks=None, templates=None):
         """
         :param data: 课程数据列表
         :param semester_start: 学期开始日期 (datetime 类型)
         :param rest_weeks: 休息周信息列表，格式为 [(after_week, rest_count), ...]
                           例如 [(3, 1)] 表示第3周后休息1周
+        :param templates: 日程显示格式模板，{"summary": ..., "location": ..., "description": ...}
+                          或 JSON 配置文件路径，缺省的项使用默认格式，见 event_template.py
         """
         self.data = data
         self.semester_start = semester_start  # 例如 datetime(2025, 3, 3)
         self.rest_weeks = rest_weeks if rest_weeks else []
+
+        # 模板编译结果按模板字符串缓存，同一批次的多个 Writer 共用
+        self.templates = load_templates(templates) if templates else DEFAULT_TEMPLATES
+        self._format_summary = compile_template(self.templates["summary"])
+        self._format_location = compile_template(self.templates["location"])
+        self._format_description = (
+            compile_template(self.templates["description"]) if self.templates["description"] else None
+        )
+        needed = self._format_summary.fields | self._format_location.fields
+        if self._format_description:
+            needed |= self._format_description.fields
+        self._build_fields = compile_field_builder(needed)
         
         # 构建逻辑周次到实际周次的映射表
         # 映射表格式：{逻辑周次: 实际周次}
@@ -98,54 +115,18 @@ class Writer:
     def get_all_actual_weeks_for_course(self, weeks_data):
         """获取课程对应的所有实际周次（包括休息周）"""
         actual_weeks = []
-        
-        if weeks_data["type"] == "continuous":
-            start = weeks_data["data"]["start"]
-            end = weeks_data["data"]["end"]
-            for logical_week in range(start, end + 1):
-                actual_week = self.logical_to_actual_week(logical_week)
-                actual_weeks.append(actual_week)
-                # 检查是否有休息周需要添加（休息周紧跟在 after_week 之后）
-                for after_week, rest_count in self.rest_weeks:
-                    if logical_week == after_week:
-                        # 在休息周范围内，添加休息周
-                        # 休息周的实际周次 = after_week 的实际周次 + 1, +2, ...
-                        base_actual_week = self.logical_to_actual_week(after_week)
-                        for i in range(rest_count):
-                            rest_actual_week = base_actual_week + i + 1
-                            if rest_actual_week not in actual_weeks:
-                                actual_weeks.append(rest_actual_week)
-        
-        elif weeks_data["type"] == "discontinuous":
-            logical_weeks = weeks_data["data"]
-            for logical_week in logical_weeks:
-                actual_week = self.logical_to_actual_week(logical_week)
-                actual_weeks.append(actual_week)
-                # 检查是否有休息周需要添加
-                for after_week, rest_count in self.rest_weeks:
-                    if logical_week == after_week:
-                        base_actual_week = self.logical_to_actual_week(after_week)
-                        for i in range(rest_count):
-                            rest_actual_week = base_actual_week + i + 1
-                            if rest_actual_week not in actual_weeks:
-                                actual_weeks.append(rest_actual_week)
-        
-        elif weeks_data["type"] == "interval":
-            start = weeks_data["data"]["start"]
-            interval = weeks_data["data"]["interval"]
-            count = weeks_data["data"]["count"]
-            logical_weeks = [start + i * interval for i in range(count)]
-            for logical_week in logical_weeks:
-                actual_week = self.logical_to_actual_week(logical_week)
-                actual_weeks.append(actual_week)
-                # 检查是否有休息周需要添加
-                for after_week, rest_count in self.rest_weeks:
-                    if logical_week == after_week:
-                        base_actual_week = self.logical_to_actual_week(after_week)
-                        for i in range(rest_count):
-                            rest_actual_week = base_actual_week + i + 1
-                            if rest_actual_week not in actual_weeks:
-                                actual_weeks.append(rest_actual_week)
+        for logical_week in expand_weeks(weeks_data):
+            actual_week = self.logical_to_actual_week(logical_week)
+            actual_weeks.append(actual_week)
+            # 检查是否有休息周需要添加（休息周紧跟在 after_week 之后）
+            for after_week, rest_count in self.rest_weeks:
+                if logical_week == after_week:
+                    # 休息周的实际周次 = after_week 的实际周次 + 1, +2, ...
+                    base_actual_week = self.logical_to_actual_week(after_week)
+                    for i in range(rest_count):
+                        rest_actual_week = base_actual_week + i + 1
+                        if rest_actual_week not in actual_weeks:
+                            actual_weeks.append(rest_actual_week)
         
         return sorted(actual_weeks)
 
@@ -154,8 +135,6 @@ class Writer:
         cal = Calendar()
 
         for course in self.data:
-            course_name = course["name"]
-            teacher = course["teacher"]
             location = course["location"]
             weekday = course["time"]["weekday"]
             lesson = course["time"]["lesson"]
@@ -181,13 +160,19 @@ class Writer:
             
             # 转换为 Asia/Shanghai 时区
             start_dt = SHANGHAI_TZ.localize(start_dt).astimezone(pytz.utc)
-            end_dt = start_dt + timedelta(minutes=110 if lesson != 7 else 50)
+            duration = timedelta(minutes=110 if lesson != 7 else 50)
+            end_dt = start_dt + duration
+
+            # 按模板生成日程名称、地点与描述
+            fields = self._build_fields(course, actual_weeks, start_time, duration)
 
             event = Event()
-            event.name = f"{course_name} - {teacher}"
+            event.name = self._format_summary(fields)
             event.begin = start_dt
             event.end = end_dt
-            event.location = location
+            event.location = self._format_location(fields)
+            if self._format_description:
+                event.description = self._format_description(fields)
 
             # 生成 RRULE（基于实际周次）
             rrule_result = self.get_rrule_from_actual_weeks(actual_weeks, weekday, start_time)
@@ -271,6 +256,11 @@ class Writer:
             rrule = f"FREQ=WEEKLY;BYDAY={week_day};COUNT={count}"
             return (rrule, exdates)
 
+    def dumps(self):
+        """将日历序列化为 ICS 文本（去除空行），不写入文件"""
+        cal = self.generate_ics()
+        return "".join(line.strip() + '\n' for line in cal if line.strip())
+
     def write(self, file_path=None):
         """写入 ICS 文件"""
         if not file_path:
@@ -0,0 +1,318 @@
+"""
+将生成的 ICS 文件以邮件附件形式批量发送（异步，复用 SMTP 连接）
+
+- 收件清单为 CSV 文件，包含 file（ICS 路径）与 email（收件人）两列
+- 多个 SMTP 连接组成连接池并发发送，按设定速率限流，临时错误按指数退避重试
+- 已发送的 (收件人, 日历内容哈希) 记录在 sqlite 中，重复执行不会重复发送；
+  哈希忽略每次生成都会变化的 UID/DTSTAMP 与日程顺序，重新生成的相同课表不会再次发送；
+  若在发送成功后、记录前崩溃，重新执行时该邮件会再发一次（至少一次语义）
+
+本地测试可使用 aiosmtpd 作为 SMTP 服务器：
+    python -m aiosmtpd -n -l localhost:8025
+    python mailer.py --manifest cohort.csv --host localhost --port 8025 --sender noreply@example.com
+
+需要登录时，用户名通过 --username 指定，密码从环境变量 SMTP_PASSWORD 读取。
+"""
+import argparse
+import asyncio
+import csv
+import hashlib
+import os
+import random
+import sqlite3
+import time
+from email.message import EmailMessage
+from email.utils import formatdate
+
+try:
+    import aiosmtplib
+except ImportError:
+    aiosmtplib = None
+
+# 邮件主题与正文
+MAIL_SUBJECT = "课程表日历文件"
+MAIL_BODY = "附件为您的课程表 iCalendar 文件。\n在 iOS 邮件 App 中打开附件，点击“添加全部”即可导入日历。\n"
+
+# 默认并发连接数、速率（封/秒）与重试次数
+DEFAULT_POOL_SIZE = 4
+DEFAULT_RATE = 10.0
+DEFAULT_MAX_ATTEMPTS = 5
+
+# 每次生成都会变化、不影响日历内容的属性
+VOLATILE_PROPERTIES = ("UID", "DTSTAMP")
+
+LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deliveries (
+    recipient TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    sent_at REAL NOT NULL,
+    PRIMARY KEY (recipient, content_hash)
+);
+"""
+
+class DeliveryLedger:
+    """记录已发送的邮件，保证重复执行时不重复发送"""
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(LEDGER_SCHEMA)
+
+    def is_sent(self, recipient, content_hash):
+        row = self.conn.execute(
+            "SELECT 1 FROM deliveries WHERE recipient = ? AND content_hash = ?",
+            (recipient.lower(), content_hash),
+        ).fetchone()
+        return row is not None
+
+    def mark_sent(self, recipient, content_hash, file_path):
+        self.conn.execute(
+            "INSERT OR IGNORE INTO deliveries (recipient, content_hash, file_path, sent_at) VALUES (?, ?, ?, ?)",
+            (recipient.lower(), content_hash, file_path, time.time()),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+class RateLimiter:
+    """令牌桶限流：平均每秒 rate 封，允许 burst 封的突发"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst if burst else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class SMTPPool:
+    """SMTP 连接池：连接在首次使用时建立，出错的连接被丢弃并在下次使用时重建"""
+
+    def __init__(self, size, **smtp_kwargs):
+        self.smtp_kwargs = smtp_kwargs
+        self._idle = asyncio.Queue()
+        for _ in range(size):
+            self._idle.put_nowait(None)
+
+    async def acquire(self):
+        client = await self._idle.get()
+        if client is None or not client.is_connected:
+            client = aiosmtplib.SMTP(**self.smtp_kwargs)
+            try:
+                await client.connect()
+            except BaseException:
+                self._idle.put_nowait(None)
+                raise
+        return client
+
+    def release(self, client, broken=False):
+        if broken:
+            client.close()
+            client = None
+        self._idle.put_nowait(client)
+
+    async def close(self):
+        while not self._idle.empty():
+            client = self._idle.get_nowait()
+            if client is not None and client.is_connected:
+                try:
+                    await client.quit()
+                except aiosmtplib.SMTPException:
+                    client.close()
+
+def calendar_hash(ics_bytes):
+    """
+    日历内容的哈希：忽略 UID/DTSTAMP，并按内容对日程排序
+    ics 库每次生成都会使用随机 UID，日程的输出顺序也不固定，直接哈希文件字节会导致重复发送
+    """
+    header = []
+    events = []
+    current = None
+    skipping = False
+    for raw in ics_bytes.decode("utf-8", errors="replace").splitlines():
+        if raw[:1] in (" ", "\t"):
+            # 折行：跟随上一行是否被忽略
+            if not skipping:
+                (current if current is not None else header).append(raw)
+            continue
+        name = raw.split(":", 1)[0].split(";", 1)[0].upper()
+        skipping = name in VOLATILE_PROPERTIES
+        if skipping:
+            continue
+        if raw == "BEGIN:VEVENT":
+            current = [raw]
+        elif raw == "END:VEVENT" and current is not None:
+            current.append(raw)
+            events.append("\n".join(current))
+            current = None
+        elif current is not None:
+            current.append(raw)
+        else:
+            header.append(raw)
+
+    h = hashlib.sha256()
+    h.update("\n".join(header).encode("utf-8"))
+    for event in sorted(events):
+        h.update(b"\0")
+        h.update(event.encode("utf-8"))
+    return h.hexdigest()
+
+def build_message(sender, recipient, file_path, ics_bytes, content_hash):
+    """构造带 ICS 附件的邮件；Message-ID 由内容哈希确定，便于收件方去重"""
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = recipient
+    message["Subject"] = MAIL_SUBJECT
+    message["Date"] = formatdate(localtime=True)
+    recipient_hash = hashlib.sha256(recipient.lower().encode("utf-8")).hexdigest()
+    message["Message-ID"] = f"<{content_hash[:32]}.{recipient_hash[:12]}@bjtu-icalendar>"
+    message.set_content(MAIL_BODY)
+    message.add_attachment(
+        ics_bytes, maintype="text", subtype="calendar",
+        filename=os.path.basename(file_path), params={"method": "PUBLISH"},
+    )
+    return message
+
+def is_transient(error):
+    """连接错误与 4xx 响应视为临时错误，可以重试；5xx（如收件人不存在）不重试"""
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return all(400 <= refused.code < 500 for refused in error.recipients)
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return 400 <= error.code < 500
+    return isinstance(error, (aiosmtplib.SMTPException, OSError, asyncio.TimeoutError))
+
+def is_connection_error(error):
+    """
+    服务器正常回复的错误（包括拒绝收件人）不影响连接，aiosmtplib 会发送 RSET 重置信封，
+    连接可以继续复用；其余错误视为连接已损坏
+    """
+    return not isinstance(error, (aiosmtplib.SMTPResponseException, aiosmtplib.SMTPRecipientsRefused))
+
+def read_manifest(manifest_path):
+    """读取收件清单，返回 [(ICS 路径, 收件人), ...]；相对路径相对于清单所在目录"""
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, "r", encoding="utf-8-sig", newline="") as f:
+        return [
+            (os.path.join(base_dir, row["file"].strip()), row["email"].strip())
+            for row in csv.DictReader(f)
+            if row.get("file") and row.get("email")
+        ]
+
+async def deliver_cohort(entries, sender, ledger, pool_size=DEFAULT_POOL_SIZE, rate=DEFAULT_RATE,
+                         max_attempts=DEFAULT_MAX_ATTEMPTS, **smtp_kwargs):
+    """
+    发送一批 ICS 文件
+    :param entries: [(ICS 路径, 收件人), ...]
+    :param ledger: DeliveryLedger
+    :return: {"sent": 数量, "skipped": 数量, "failed": 数量, "elapsed": 秒}
+    """
+    if aiosmtplib is None:
+        raise ImportError("发送邮件需要安装 aiosmtplib：pip install aiosmtplib")
+
+    pool = SMTPPool(pool_size, **smtp_kwargs)
+    limiter = RateLimiter(rate)
+    stats = {"sent": 0, "skipped": 0, "failed": 0}
+    claimed = set()
+    queue = asyncio.Queue()
+    for entry in entries:
+        queue.put_nowait(entry)
+
+    async def send_one(file_path, recipient):
+        with open(file_path, "rb") as f:
+            ics_bytes = f.read()
+        content_hash = calendar_hash(ics_bytes)
+        key = (recipient.lower(), content_hash)
+        # 清单中的重复条目在同一次执行内也只发送一次
+        if key in claimed or ledger.is_sent(recipient, content_hash):
+            stats["skipped"] += 1
+            return
+        claimed.add(key)
+
+        message = build_message(sender, recipient, file_path, ics_bytes, content_hash)
+        for attempt in range(1, max_attempts + 1):
+            await limiter.acquire()
+            client = None
+            try:
+                client = await pool.acquire()
+                await client.send_message(message)
+                pool.release(client)
+                client = None
+                ledger.mark_sent(recipient, content_hash, file_path)
+                stats["sent"] += 1
+                return
+            except Exception as e:
+                if client is not None:
+                    pool.release(client, broken=is_connection_error(e))
+                if not is_transient(e) or attempt == max_attempts:
+                    print(f"发送失败: {recipient} ({os.path.basename(file_path)}): {e}")
+                    stats["failed"] += 1
+                    return
+                # 指数退避并加入随机抖动
+                await asyncio.sleep(min(60.0, 0.5 * 2 ** (attempt - 1)) * (0.5 + random.random()))
+
+    async def worker():
+        while True:
+            try:
+                file_path, recipient = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                await send_one(file_path, recipient)
+            except OSError as e:
+                print(f"读取失败: {file_path}: {e}")
+                stats["failed"] += 1
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(pool_size)))
+    finally:
+        await pool.close()
+    stats["elapsed"] = time.perf_counter() - started
+    return stats
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="以邮件附件形式批量发送 ICS 文件")
+    arg_parser.add_argument("--manifest", required=True, help="收件清单 CSV（file,email 两列）")
+    arg_parser.add_argument("--ledger", default="deliveries.sqlite", help="发送记录数据库路径")
+    arg_parser.add_argument("--host", required=True, help="SMTP 服务器地址")
+    arg_parser.add_argument("--port", type=int, default=25, help="SMTP 端口")
+    arg_parser.add_argument("--sender", required=True, help="发件人地址")
+    arg_parser.add_argument("--username", help="SMTP 用户名（密码从环境变量 SMTP_PASSWORD 读取）")
+    arg_parser.add_argument("--tls", action="store_true", help="使用 SSL/TLS 直连（通常为 465 端口）")
+    arg_parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE, help="SMTP 连接数")
+    arg_parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="每秒最多发送的邮件数")
+    arg_parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, help="每封邮件的最多尝试次数")
+    args = arg_parser.parse_args(argv)
+
+    smtp_kwargs = {"hostname": args.host, "port": args.port, "use_tls": args.tls}
+    if args.username:
+        smtp_kwargs["username"] = args.username
+        smtp_kwargs["password"] = os.environ.get("SMTP_PASSWORD", "")
+
+    entries = read_manifest(args.manifest)
+    ledger = DeliveryLedger(args.ledger)
+    try:
+        stats = asyncio.run(deliver_cohort(
+            entries, args.sender, ledger, pool_size=args.pool_size, rate=args.rate,
+            max_attempts=args.max_attempts, **smtp_kwargs,
+        ))
+    finally:
+        ledger.close()
+
+    rate = stats["sent"] / stats["elapsed"] if stats["elapsed"] > 0 else 0.0
+    print(f"发送完成：成功 {stats['sent']} 封，跳过已发送 {stats['skipped']} 封，"
+          f"失败 {stats['failed']} 封，{rate:.1f} 封/秒")
+
+if __name__ == "__main__":
+    main()
@@ -6,14 +6,40 @@ import re
 import os
 import platform
 
+try:
+    from charset_normalizer import from_bytes
+except ImportError:
+    from_bytes = None
+
+# 在页面开头查找 <meta charset="..."> 或 content="text/html; charset=..."
+META_CHARSET_PATTERN = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?([\w-]+)""", re.IGNORECASE)
+
+# GB2312/GBK 均按其超集 GB18030 解码
+CHARSET_ALIASES = {
+    "gb2312": "gb18030",
+    "gbk": "gb18030",
+}
+
 class Parser:
-    def __init__(self, file_path=None):
-        print("file_path:", file_path if file_path else "None")
+    def __init__(self, file_path=None, verbose=True):
+        """
+        :param file_path: 课表 HTML 文件路径、字节串（bytes/memoryview）或类文件对象，
+                          为空时弹出文件选择窗口
+        :param verbose: 是否打印解析过程（批量处理时建议关闭）
+        """
+        self.verbose = verbose
+        if isinstance(file_path, (bytes, bytearray, memoryview)) or hasattr(file_path, "read"):
+            # 直接传入页面内容，不经过文件系统
+            self.file_path = file_path
+            return
+        if self.verbose:
+            print("file_path:", file_path if file_path else "None")
         self.file_path = file_path if file_path else select_html_file()
         if not self.file_path:
             print("未选择文件，程序退出")
             exit()
-        print("self.file_path:", self.file_path)
+        if self.verbose:
+            print("self.file_path:", self.file_path)
 
     def parse(self):
         """
@@ -58,8 +84,7 @@ class Parser:
         # 解析后的数据
         parsed_data = []
         
-        with open(self.file_path, "r", encoding="utf-8") as f:
-            html = f.read()
+        html = decode_html(read_source(self.file_path))
         
         # 使用 BeautifulSoup 解析 HTML
         soup = BeautifulSoup(html, "html.parser")
@@ -98,7 +123,8 @@ class Parser:
                         <span class="green" style="display: inline-block;">[ 选中 ]</span>
                     </div>
                     """
-                    print(div)
+                    if self.verbose:
+                        print(div)
                     
                     # 解析课程信息
                     course_info = div.find("span").get_text().strip()
@@ -130,6 +156,53 @@ class Parser:
 
         return parsed_data
     
+def read_source(source):
+    """读取页面的原始字节：路径、字节串或类文件对象"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return source
+    if hasattr(source, "read"):
+        return source.read()
+    with open(source, "rb") as f:
+        return f.read()
+
+def decode_html(raw):
+    """
+    根据原始字节判断编码并解码为字符串，换行统一为 "\n"
+    依次尝试：BOM、UTF-8、页面声明的 charset、charset_normalizer（若已安装）、GB18030
+    """
+    if isinstance(raw, str):
+        text = raw
+    else:
+        text = _decode_bytes(raw)
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+def _decode_bytes(raw):
+    head = bytes(raw[:4])
+    if head.startswith(b"\xef\xbb\xbf"):
+        return str(raw[3:], "utf-8", errors="replace")
+    if head.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return str(raw, "utf-16", errors="replace")
+
+    try:
+        return str(raw, "utf-8")
+    except UnicodeDecodeError:
+        pass
+
+    match = META_CHARSET_PATTERN.search(bytes(raw[:4096]))
+    if match:
+        charset = match.group(1).decode("ascii").lower()
+        try:
+            return str(raw, CHARSET_ALIASES.get(charset, charset))
+        except (LookupError, UnicodeDecodeError):
+            pass
+
+    if from_bytes is not None:
+        best = from_bytes(bytes(raw)).best()
+        if best is not None:
+            return str(best)
+
+    return str(raw, "gb18030", errors="replace")
+
 def week_type_detect(weeks_str):
     """
     判断周数格式，并返回 time_type 和 time_data
@@ -159,6 +232,21 @@ def week_type_detect(weeks_str):
     
     return time_type, time_data
 
+def expand_weeks(weeks_data):
+    """
+    将 week_type_detect 得到的周次数据展开为逻辑周次列表
+    :param weeks_data: {"type": time_type, "data": time_data}
+    :return: 逻辑周次列表，如 [1, 3, 5]；未知格式返回空列表
+    """
+    if weeks_data["type"] == "continuous":
+        return list(range(weeks_data["data"]["start"], weeks_data["data"]["end"] + 1))
+    elif weeks_data["type"] == "discontinuous":
+        return list(weeks_data["data"])
+    elif weeks_data["type"] == "interval":
+        data = weeks_data["data"]
+        return [data["start"] + i * data["interval"] for i in range(data["count"])]
+    return []
+
 def select_html_file():
     """弹出文件选择窗口，让用户选择课表 HTML 文件，并返回文件路径"""
     root = tk.Tk()
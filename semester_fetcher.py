@@ -195,6 +195,28 @@ def extract_semester_info(semester_data):
     
     return semester_start, rest_weeks
 
+def parse_rest_weeks(rest_weeks_str):
+    """
+    解析命令行形式的休息周信息
+    格式: "3,1,7,2" 表示第3周后休息1周，第7周后休息2周；空字符串表示无休息周
+    返回: [(after_week, rest_count), ...]，按 after_week 排序
+    """
+    rest_weeks = []
+    if not rest_weeks_str or not rest_weeks_str.strip():
+        return rest_weeks
+
+    parts = rest_weeks_str.split(",")
+    if len(parts) % 2 != 0:
+        raise ValueError("休息周信息格式不正确，应为：第几周后休息几周，多个用逗号分隔")
+    for i in range(0, len(parts), 2):
+        try:
+            rest_weeks.append((int(parts[i].strip()), int(parts[i + 1].strip())))
+        except ValueError:
+            raise ValueError(f"无法解析休息周信息：{parts[i]}, {parts[i + 1]}")
+
+    rest_weeks.sort(key=lambda x: x[0])
+    return rest_weeks
+
 if __name__ == "__main__":
     try:
         semester_start, rest_weeks = fetch_semester_info()
@@ -0,0 +1,239 @@
+"""
+监视 pages 目录，新增或修改的课表 HTML 会被自动转换为 ICS 文件
+
+优先使用 watchdog（Linux 下为 inotify）接收文件事件，未安装时退化为定时轮询。
+同一文件在短时间内的多次事件会被合并（debounce），只重新生成受影响的课表。
+学期信息只在启动时获取一次，页面内容哈希缓存在进程内，内容未变化的事件会被忽略。
+
+用法示例：
+    python watcher.py --output out --semester-start 20250224 --rest-weeks 3,1
+"""
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from batch_job import HTML_SUFFIXES, content_hash, convert_page, output_path_for, params_key
+from semester_fetcher import fetch_semester_info, parse_rest_weeks
+from event_template import load_templates
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+# 默认监视的目录（与 select_html_file 一致）
+DEFAULT_PAGES_DIR = os.path.join(os.path.dirname(__file__), "pages")
+
+# 同一文件最后一次事件后等待多久（秒）再处理
+DEFAULT_DEBOUNCE_SECONDS = 1.0
+
+# 轮询模式下的扫描间隔（秒）
+DEFAULT_POLL_INTERVAL = 2.0
+
+class _EventHandler(FileSystemEventHandler):
+    """将 watchdog 事件转发给 PagesWatcher"""
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.dest_path)
+
+class PagesWatcher:
+    def __init__(self, pages_dir, output_dir, semester_start, rest_weeks=None,
+                 debounce=DEFAULT_DEBOUNCE_SECONDS, workers=4, poll_interval=None, templates=None):
+        """
+        :param pages_dir: 监视的课表 HTML 目录
+        :param output_dir: ICS 输出目录
+        :param semester_start: 学期开始日期 (datetime 类型)
+        :param rest_weeks: 休息周信息列表，格式为 [(after_week, rest_count), ...]
+        :param debounce: 合并事件的静默时间（秒）
+        :param workers: 并行生成的线程数
+        :param poll_interval: 轮询间隔（秒）；为 None 时优先使用 watchdog
+        :param templates: 日程显示格式模板，见 Writer
+        """
+        self.pages_dir = os.path.abspath(pages_dir)
+        self.output_dir = os.path.abspath(output_dir)
+        self.semester_start = semester_start
+        self.rest_weeks = rest_weeks if rest_weeks else []
+        self.templates = templates
+        self.key = params_key(self.semester_start, self.rest_weeks, self.templates)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._lock = threading.Lock()
+        self._pending = {}      # {路径: (第一次事件时间, 最后一次事件时间)}
+        self._in_flight = set()  # 正在生成的路径
+        self._hashes = {}       # {路径: 最近一次生成时的内容哈希}
+        self._stop = threading.Event()
+        self._threads = []
+        self._observer = None
+
+    def notify(self, path):
+        """记录一次文件事件，等待 debounce 后处理；保留第一次事件时间用于统计耗时"""
+        if not path.lower().endswith(HTML_SUFFIXES):
+            return
+        now = time.time()
+        path = os.path.abspath(path)
+        with self._lock:
+            first_event = self._pending[path][0] if path in self._pending else now
+            self._pending[path] = (first_event, now)
+
+    def start(self):
+        """启动监视；启动时先补齐输出缺失或过期的页面"""
+        os.makedirs(self.pages_dir, exist_ok=True)
+        for path in self._scan().keys():
+            out_path = output_path_for(path, self.pages_dir, self.output_dir)
+            if not os.path.exists(out_path) or os.path.getmtime(out_path) < os.path.getmtime(path):
+                self.notify(path)
+
+        if self.poll_interval is None and Observer is not None:
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self), self.pages_dir, recursive=True)
+            self._observer.start()
+            print(f"正在监视 {self.pages_dir}（watchdog）")
+        else:
+            self._spawn(self._poll_loop)
+            print(f"正在监视 {self.pages_dir}（轮询，间隔 {self._poll_seconds()} 秒）")
+        self._spawn(self._flush_loop)
+
+    def stop(self):
+        """停止监视并等待正在进行的生成任务完成"""
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        for thread in self._threads:
+            thread.join()
+        self._pool.shutdown(wait=True)
+
+    def run_forever(self):
+        self.start()
+        try:
+            while not self._stop.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            print("\n正在退出...")
+        finally:
+            self.stop()
+
+    def _spawn(self, target):
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _poll_seconds(self):
+        return self.poll_interval if self.poll_interval is not None else DEFAULT_POLL_INTERVAL
+
+    def _scan(self):
+        """返回 {路径: (修改时间, 大小)}"""
+        snapshot = {}
+        for root, _, files in os.walk(self.pages_dir):
+            for name in files:
+                if name.lower().endswith(HTML_SUFFIXES):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    snapshot[path] = (st.st_mtime, st.st_size)
+        return snapshot
+
+    def _poll_loop(self):
+        """轮询模式：比较前后两次扫描结果"""
+        previous = self._scan()
+        while not self._stop.wait(self._poll_seconds()):
+            current = self._scan()
+            for path, stat in current.items():
+                if previous.get(path) != stat:
+                    self.notify(path)
+            previous = current
+
+    def _flush_loop(self):
+        """将静默超过 debounce 的路径提交给线程池"""
+        tick = min(self.debounce / 4, 0.25) if self.debounce > 0 else 0.05
+        while not self._stop.wait(tick):
+            now = time.time()
+            ready = []
+            with self._lock:
+                for path, (first_event, last_event) in list(self._pending.items()):
+                    # 同一文件正在生成时保留事件，待其完成后再处理
+                    if now - last_event >= self.debounce and path not in self._in_flight:
+                        del self._pending[path]
+                        self._in_flight.add(path)
+                        ready.append((path, first_event))
+            for path, first_event in ready:
+                self._pool.submit(self._regenerate, path, first_event)
+
+    def _regenerate(self, path, first_event):
+        """
+        重新生成单个页面对应的 ICS 文件，并打印从收到文件事件到写出 ICS 的耗时
+        :param first_event: 本轮合并的第一次事件时间；文件修改时间晚于它时从修改时间算起
+        """
+        try:
+            try:
+                # 启动时补齐的旧页面修改时间早于事件时间，不会把页面年龄算作耗时
+                dropped_at = max(first_event, os.path.getmtime(path))
+                with open(path, "rb") as f:
+                    html_bytes = f.read()
+                input_hash = content_hash(html_bytes, self.key)
+            except FileNotFoundError:
+                return  # 文件已被删除或移走
+
+            if self._hashes.get(path) == input_hash:
+                return  # 内容未变化
+
+            out_path = output_path_for(path, self.pages_dir, self.output_dir)
+            convert_page(html_bytes, out_path, self.semester_start, self.rest_weeks, self.templates)
+            self._hashes[path] = input_hash
+            latency = time.time() - dropped_at
+            print(f"已生成 {out_path}（{os.path.basename(path)}，耗时 {latency * 1000:.0f} ms）")
+        except Exception as e:
+            print(f"生成失败: {path}: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(path)
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="监视课表目录并自动生成 ICS 文件")
+    arg_parser.add_argument("--pages", default=DEFAULT_PAGES_DIR, help="监视的课表 HTML 目录")
+    arg_parser.add_argument("--output", required=True, help="ICS 输出目录")
+    arg_parser.add_argument("--semester-start", help="教学周第一周周一的日期，如 20250224；为空时自动获取")
+    arg_parser.add_argument("--rest-weeks", default="", help="休息周信息，如 3,1,7,2")
+    arg_parser.add_argument("--templates", help="日程显示格式模板配置文件（JSON），见 event_template.py")
+    arg_parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE_SECONDS, help="合并事件的静默时间（秒）")
+    arg_parser.add_argument("--workers", type=int, default=4, help="并行生成的线程数")
+    arg_parser.add_argument("--poll", type=float, metavar="SECONDS", help="使用轮询模式并指定扫描间隔")
+    args = arg_parser.parse_args(argv)
+
+    if args.semester_start:
+        semester_start = datetime.strptime(args.semester_start, "%Y%m%d")
+        rest_weeks = parse_rest_weeks(args.rest_weeks)
+    else:
+        semester_start, rest_weeks = fetch_semester_info()
+
+    if args.poll is None and Observer is None:
+        print("未安装 watchdog，使用轮询模式")
+
+    watcher = PagesWatcher(args.pages, args.output, semester_start, rest_weeks,
+                           debounce=args.debounce, workers=args.workers, poll_interval=args.poll,
+                           templates=load_templates(args.templates) if args.templates else None)
+    watcher.run_forever()
+
+if __name__ == "__main__":
+    main()